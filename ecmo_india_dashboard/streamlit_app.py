@@ -1,12 +1,16 @@
 # streamlit_app.py — ECMO India Live Dashboard (Sheets + charts, tolerant headers)
 
+from collections import defaultdict
+from pathlib import Path
 from urllib.parse import quote_plus
+import hashlib
+import logging
+import os
 import re
+import tempfile
+import numpy as np
 import pandas as pd
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
-import plotly.express as px
 
 # ---------------- Page setup ----------------
 st.set_page_config(page_title="ECMO India – Live Dashboard", layout="wide")
@@ -17,25 +21,24 @@ SHEET_ID = "19MGz1nP5k0B-by9dLE9LgA3BTuQ4FYn1cEAGklvZprE"   # spreadsheet id
 WORKSHEET_NAME = "Form responses 15"                        # exact tab name you're using now
 
 # ---------------- Auth / loader ----------------
+REFRESH_SECONDS = 60   # how long a sheet read (and its tidy-up) stays cached
+SNAPSHOT_DIR = Path(__file__).with_name(".cache")   # local Parquet copies of the sheet
+ARROW_STR = "string[pyarrow]"   # Arrow-backed text: .str ops run as Arrow compute kernels
+TABLE_MAX_ROWS = 2000   # rows sent to the browser at once; longer sheets get a slider
+
 SCOPE = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
 
 def _dedupe_headers(headers: list[str]) -> list[str]:
-    """If headers contain duplicates, append ' (2)', ' (3)', ... to later ones."""
-    seen = {}
+    """Strip headers; if they contain duplicates, append ' (2)', ' (3)', ... to later ones."""
+    seen = defaultdict(int)
     result = []
     for h in headers:
-        key = (h or "").strip()
-        if key == "":
-            key = "Unnamed"
-        if key not in seen:
-            seen[key] = 1
-            result.append(key)
-        else:
-            seen[key] += 1
-            result.append(f"{key} ({seen[key]})")
+        key = (h or "").strip() or "Unnamed"
+        seen[key] += 1
+        result.append(key if seen[key] == 1 else f"{key} ({seen[key]})")
     return result
 
 def _newest_form_responses_tab(worksheets) -> str | None:
@@ -55,69 +58,313 @@ def _newest_form_responses_tab(worksheets) -> str | None:
                 best = w.title
     return best
 
-@st.cache_data(ttl=60)
-def load_data_from_sheet(sheet_id: str, ws_name: str) -> pd.DataFrame:
-    """Load a worksheet into a DataFrame, allowing duplicate headers safely."""
+@st.cache_resource
+def _gs_client():
+    """Authorised gspread client, shared across reruns so the OAuth token is reused."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds = Credentials.from_service_account_info(
         st.secrets["gcp_service_account"], scopes=SCOPE
     )
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(sheet_id)
+    return gspread.authorize(creds)
+
+@st.cache_resource
+def _open_sheet(sheet_id: str):
+    return _gs_client().open_by_key(sheet_id)
+
+def _tab_values(sh, title: str) -> list[list[str]]:
+    """All cells of one tab via a single values.get, with rows padded to equal width."""
+    quoted = "'" + title.replace("'", "''") + "'"
+    rows = sh.values_get(quoted).get("values", [])
+    width = max(map(len, rows), default=0)
+    return [r + [""] * (width - len(r)) for r in rows]
+
+def fetch_sheet(sheet_id: str, ws_name: str) -> tuple[pd.DataFrame, str]:
+    """
+    Load a worksheet into a DataFrame, allowing duplicate headers safely.
+    Also returns the title of the tab actually read (differs from ws_name after a fallback).
+    """
+    import gspread   # imported here so cache hits never load the Google client stack
 
-    # Try exact tab name; if missing, fall back to newest "Form responses*" tab or first sheet
+    sh = _open_sheet(sheet_id)
+
+    # Read the tab by name in one values.get call (skips the worksheet-metadata lookup);
+    # if the name doesn't resolve, fall back to newest "Form responses*" tab or first sheet
+    title = ws_name
     try:
-        ws = sh.worksheet(ws_name)
-    except gspread.exceptions.WorksheetNotFound:
-        tabs = sh.worksheets()
-        newest = _newest_form_responses_tab(tabs)
-        if newest:
-            ws = sh.worksheet(newest)
+        values = _tab_values(sh, title)
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code != 400:   # 400 = "Unable to parse range", i.e. no such tab
+            raise
+        tabs = sh.worksheets()   # one metadata call; titles come from it, no per-tab re-fetch
+        title = _newest_form_responses_tab(tabs)
+        if title:
             st.warning(
-                f"Worksheet '{ws_name}' not found — using newest responses tab: '{ws.title}'. "
+                f"Worksheet '{ws_name}' not found — using newest responses tab: '{title}'. "
                 f"Available tabs include: {[w.title for w in tabs]}"
             )
         else:
-            ws = sh.sheet1
+            title = tabs[0].title
             st.warning(
-                f"Worksheet '{ws_name}' not found — using first tab: '{ws.title}'. "
+                f"Worksheet '{ws_name}' not found — using first tab: '{title}'. "
                 f"Available tabs: {[w.title for w in tabs]}"
             )
+        values = _tab_values(sh, title)
 
-    # Pull raw grid values; FIRST ROW = headers (may contain duplicates)
-    values = ws.get_all_values() or []
+    # FIRST ROW = headers (may contain duplicates)
     if not values:
-        return pd.DataFrame()
+        return pd.DataFrame(), title
 
-    raw_headers = [h.strip() for h in values[0]]
-    headers = _dedupe_headers(raw_headers)   # make them unique
+    headers = _dedupe_headers(values[0])   # stripped once here, and made unique
     rows = values[1:]
-    df = pd.DataFrame(rows, columns=headers)
+    # Every cell is text: declare it (Arrow-backed) instead of letting pandas infer object columns
+    return pd.DataFrame(rows, columns=headers, dtype=ARROW_STR), title
+
+def _snapshot_prefix(sheet_id: str, ws_name: str) -> str:
+    return re.sub(r"[^\w-]+", "_", f"{sheet_id}_{ws_name}")
+
+def _snapshot_path(sheet_id: str, ws_name: str, revision: str) -> Path:
+    """Parquet file for one (sheet, tab, revision); the prefix is readable, the suffix a hash."""
+    digest = hashlib.sha1(f"{sheet_id}|{ws_name}|{revision}".encode()).hexdigest()[:16]
+    return SNAPSHOT_DIR / f"{_snapshot_prefix(sheet_id, ws_name)}_{digest}.parquet"
+
+def _prune_snapshots(sheet_id: str, ws_name: str, keep: Path | None = None) -> None:
+    """Delete this tab's snapshots other than `keep` (all of them if None)."""
+    for old in SNAPSHOT_DIR.glob(f"{_snapshot_prefix(sheet_id, ws_name)}_{'?' * 16}.parquet"):
+        if old != keep:
+            old.unlink(missing_ok=True)
+
+@st.cache_resource
+def _drive_unavailable() -> dict[str, bool]:
+    """Process-wide flag, set once Drive has refused the metadata call so it isn't retried."""
+    return {"refused": False}
+
+def _sheet_revision(sheet_id: str) -> str | None:
+    """The spreadsheet's Drive modifiedTime (one small metadata call), or None if unavailable."""
+    import gspread
+
+    flag = _drive_unavailable()
+    if flag["refused"]:
+        return None
+    try:
+        return _open_sheet(sheet_id).get_lastUpdateTime()
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code == 403:   # Drive API not enabled for the project
+            flag["refused"] = True
+            logging.getLogger(__name__).warning(
+                "Drive API unavailable (%s); Parquet snapshots are disabled.", e
+            )
+        return None
 
-    # strip surrounding whitespace in all column names
-    df.columns = [c.strip() for c in df.columns]
+@st.cache_data(ttl=REFRESH_SECONDS)
+def load_data_from_sheet(sheet_id: str, ws_name: str) -> pd.DataFrame:
+    """
+    Sheet as a DataFrame. The sheet's modifiedTime picks a local Parquet snapshot; if one
+    exists for that revision it is read instead of re-downloading the grid, so unchanged
+    sheets skip the fetch after every TTL expiry and across restarts.
+    """
+    revision = _sheet_revision(sheet_id)
+    path = _snapshot_path(sheet_id, ws_name, revision) if revision else None
+    if path is not None:
+        try:
+            return pd.read_parquet(path).astype(ARROW_STR)
+        except (OSError, ValueError):   # no snapshot for this revision yet, or unreadable
+            pass
+
+    df, title = fetch_sheet(sheet_id, ws_name)
+    # A fallback tab isn't snapshotted: the refetch keeps its "not found" warning showing
+    if path is not None and title == ws_name:
+        try:
+            SNAPSHOT_DIR.mkdir(exist_ok=True)
+            # Write beside the target, then rename: readers never see a half-written file
+            fd, tmp = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+            os.close(fd)
+            try:
+                df.to_parquet(tmp, compression="zstd", index=False)
+                os.replace(tmp, path)
+            finally:
+                Path(tmp).unlink(missing_ok=True)
+            _prune_snapshots(sheet_id, ws_name, keep=path)
+        except OSError:                 # read-only filesystem: just skip the snapshot
+            pass
     return df
 
 # ---------------- Helpers ----------------
+MAPS_SEARCH_URL = "https://www.google.com/maps/search/?api=1&query="
+
 def build_maps_link(hospital: str, city: str, state: str) -> str:
     parts = [str(x).strip() for x in [hospital, city, state] if str(x).strip()]
     if not parts:
         return ""
-    return f"https://www.google.com/maps/search/?api=1&query={quote_plus(' '.join(parts))}"
+    return f"{MAPS_SEARCH_URL}{quote_plus(' '.join(parts))}"
+
+def build_maps_links_vec(hosp: pd.Series, city: pd.Series, state: pd.Series) -> pd.Series:
+    """Column-wise build_maps_link: each distinct (hospital, city, state) is encoded once."""
+    key = hosp.astype(ARROW_STR).fillna("").str.cat(
+        [city.astype(ARROW_STR).fillna(""), state.astype(ARROW_STR).fillna("")], sep="\x1f"
+    )
+    uniq = key.drop_duplicates()
+    q = uniq.str.replace(r"[\s\x1f]+", " ", regex=True).str.strip()
+    urls = (MAPS_SEARCH_URL + q.map(quote_plus)).where(q.ne(""), "")
+    return key.map(dict(zip(uniq, urls))).astype(ARROW_STR)
 
-def first_nonempty(a, b):
-    a_str = str(a).strip()
-    b_str = str(b).strip()
-    return a if a_str else (b if b_str else "")
+def text_col(df: pd.DataFrame, col: str | None) -> pd.Series:
+    """Column as a Series, or an all-blank Series when the column wasn't found."""
+    return df[col] if col else pd.Series("", index=df.index)
 
-def pick(cols, *candidates):
+def coalesce_duplicates(df: pd.DataFrame, base_name: str) -> str | None:
+    """
+    Fold '<base>', '<base> (2)', '<base> (3)', ... into the first of them, taking the
+    first non-empty value per row. Returns that column's name (None if there is none).
+    """
+    base = base_name.lower()
+    dup_cols = [
+        c for c in df.columns
+        if (lc := c.lower()) == base
+        or (lc.startswith(base + " (") and lc.endswith(")") and lc[len(base) + 2:-1].isdigit())
+    ]
+    if len(dup_cols) < 2:
+        return dup_cols[0] if dup_cols else None
+
+    block = df[dup_cols].fillna("").astype(str)
+    filled = block.apply(lambda c: c.str.strip().ne("")).to_numpy()
+    values = block.to_numpy()
+    first = values[np.arange(len(values)), filled.argmax(axis=1)]
+    df[dup_cols[0]] = pd.Series(np.where(filled.any(axis=1), first, ""), index=df.index, dtype=ARROW_STR)
+    return dup_cols[0]
+
+def top_n_with_other(counts: pd.Series, n: int, other: str = "Other") -> pd.Series:
+    """Keep the n largest counts (input sorted descending) and fold the rest into `other`."""
+    if len(counts) <= n:
+        return counts
+    return pd.concat([counts.iloc[:n], pd.Series({other: counts.iloc[n:].sum()})])
+
+def header_lookup(cols) -> dict[str, str]:
+    """Map normalised header (stripped, lower-case) -> actual column name; first wins."""
+    lut = {}
+    for c in cols:
+        lut.setdefault(str(c).strip().lower(), c)
+    return lut
+
+def pick(lut: dict[str, str], *candidates):
+    """First candidate present in the header lookup (case-insensitive)."""
     for c in candidates:
-        if c and c in cols:
-            return c
+        if c and c.strip().lower() in lut:
+            return lut[c.strip().lower()]
     return None
 
+def display_dataframe_quickly(df: pd.DataFrame, max_rows: int = TABLE_MAX_ROWS, **st_dataframe_kwargs):
+    """st.dataframe, but frames longer than max_rows are shown as a slider-picked window."""
+    n_rows = len(df)
+    if n_rows > max_rows:
+        start = st.slider("Start row", 0, n_rows - max_rows, 0)
+        st.caption(f"Showing rows {start + 1}–{start + max_rows} of {n_rows}")
+        df = df.iloc[start:start + max_rows]
+    st.dataframe(df, **st_dataframe_kwargs)
+
+# ---------------- Tidy (cached) ----------------
+def _frame_fingerprint(d: pd.DataFrame) -> tuple:
+    """Content key for prepare(): changes only when the sheet's values change."""
+    return (tuple(d.columns), len(d), int(pd.util.hash_pandas_object(d, index=False).sum()))
+
+def to_csv_bytes(df: pd.DataFrame, columns: list[str]) -> bytes:
+    """All rows as CSV for the download button."""
+    return df.to_csv(index=False, columns=columns).encode("utf-8")
+
+@st.cache_data(ttl=REFRESH_SECONDS, hash_funcs={pd.DataFrame: _frame_fingerprint})
+def prepare(
+    df: pd.DataFrame,
+) -> tuple[pd.DataFrame, dict[str, str | None], list[str], dict[str, pd.Series], bytes]:
+    """
+    Map columns, add derived columns, work out the display order, count the chart labels
+    and encode the CSV export.
+    Cached so widget reruns reuse the result until the sheet content changes.
+    Works on `df` in place: it is the caller's own copy from load_data_from_sheet.
+    """
+    # Keep a snapshot of the original columns (from the sheet) so we can show ALL of them
+    orig_cols = list(df.columns)
+
+    # ---- Flexible column mapping (extended for your new form) ----
+    lut = header_lookup(df.columns)   # built once; every pick() below is a dict lookup
+    # Timestamp: prefer 'Timestamp'; else combine 'ECMO initiation date' + 'ECMO initiation time'
+    col_time = pick(lut, "Timestamp")
+    col_date = pick(lut, "ECMO initiation date", "Date of initiation")
+    col_time_only = pick(lut, "ECMO initiation time", "Initiation time")
+
+    if not col_time and (col_date or col_time_only):
+        df["Initiation DateTime"] = (
+            text_col(df, col_date).astype(ARROW_STR).fillna("").str.strip() + " "
+            + text_col(df, col_time_only).astype(ARROW_STR).fillna("").str.strip()
+        ).str.strip()
+        col_time = "Initiation DateTime"
+
+    # Hospital (now also matches "Initiation Hospital")
+    col_hosp  = pick(lut, "Hospital", "Initiation Hospital")
+
+    # City / State (State also matches your UT/Outside variant)
+    col_city  = pick(lut, "Location City", "Location_City")
+    col_state = pick(lut, "Location State", "Location_State", "Location State/UT/Outside India")
+
+    # ECMO type & Diagnosis
+    col_ecmo  = pick(lut, "ECMO Type", "ECMO_Type")
+    col_diag  = pick(lut, "Provisional Diagnosis", "Provisional diagnos", "Provisional Diagnos")
+
+    # Age, Senior intensivist
+    col_age    = pick(lut, "Age of the patient", "Age")
+    col_senior = pick(lut, "Name of Senior intensivist supervising the procedure")
+
+    # Misc comments may be split across duplicates coming from dedup
+    # ("Miscellaneous comments", "Miscellaneous comments (2)", ...): fold them, prefer non-empty
+    combined_misc_col = coalesce_duplicates(df, "Miscellaneous comments")
+
+    # Single Google Maps link (use hospital + city + state)
+    if col_hosp or col_city or col_state:
+        df["Google Maps"] = build_maps_links_vec(
+            text_col(df, col_hosp), text_col(df, col_city), text_col(df, col_state)
+        )
+
+    # Add 1-based serial number
+    df.insert(0, "S.No", np.arange(1, len(df) + 1, dtype=np.int64))
+
+    # ---------------- Show ALL columns ----------------
+    # Start with S.No, then every original column from the sheet, preserving their order.
+    display_cols = ["S.No"] + orig_cols
+
+    # If we created "Initiation DateTime" (no native Timestamp), slot it right after S.No.
+    if "Initiation DateTime" in df.columns and "Initiation DateTime" not in display_cols:
+        display_cols.insert(1, "Initiation DateTime")
+
+    # If we created a combined Misc column and it's not already present, append it.
+    if combined_misc_col and combined_misc_col not in display_cols:
+        display_cols.append(combined_misc_col)
+
+    # Ensure Google Maps is shown at the end.
+    if "Google Maps" in df.columns and "Google Maps" not in display_cols:
+        display_cols.append("Google Maps")
+
+    # Only include columns that exist (guard against rare mismatches)
+    display_cols = [c for c in display_cols if c in df.columns]
+
+    cols = {
+        "time": col_time, "hosp": col_hosp, "city": col_city, "state": col_state,
+        "ecmo": col_ecmo, "diag": col_diag, "age": col_age, "senior": col_senior,
+        "misc": combined_misc_col,
+    }
+
+    # Chart inputs: every label count in this one cached pass, sorted by count. Labels are
+    # normalised on a temporary Series; the displayed columns keep the sheet's values.
+    counts = {
+        k: df[cols[k]].fillna("Unknown").str.strip().value_counts()
+        for k in ("ecmo", "state") if cols[k]
+    }
+    # Encoded here so the download button reuses it; no extra hash of the prepared frame per rerun
+    csv_bytes = to_csv_bytes(df, display_cols)
+    return df, cols, display_cols, counts, csv_bytes
+
 # ---------------- Load + tidy data ----------------
 try:
-    df = load_data_from_sheet(SHEET_ID, WORKSHEET_NAME)
+    df_raw = load_data_from_sheet(SHEET_ID, WORKSHEET_NAME)
 except Exception as e:
     st.error(
         "❌ Could not load data from Google Sheets.\n\n"
@@ -129,121 +376,86 @@ except Exception as e:
     )
     st.stop()
 
-# Keep a snapshot of the original columns (from the sheet) so we can show ALL of them
-orig_cols = list(df.columns)
-
-# ---- Flexible column mapping (extended for your new form) ----
-# Timestamp: prefer 'Timestamp'; else combine 'ECMO initiation date' + 'ECMO initiation time'
-col_time = pick(df.columns, "Timestamp")
-col_date = pick(df.columns, "ECMO initiation date", "Date of initiation")
-col_time_only = pick(df.columns, "ECMO initiation time", "Initiation time")
-
-if not col_time and (col_date or col_time_only):
-    df["Initiation DateTime"] = df.apply(
-        lambda r: f"{str(r.get(col_date, '')).strip()} {str(r.get(col_time_only, '')).strip()}".strip(),
-        axis=1
-    )
-    col_time = "Initiation DateTime"
-
-# Hospital (now also matches "Initiation Hospital")
-col_hosp  = pick(df.columns, "Hospital", "Initiation Hospital")
-
-# City / State (State also matches your UT/Outside variant)
-col_city  = pick(df.columns, "Location City", "Location_City")
-col_state = pick(df.columns, "Location State", "Location_State", "Location State/UT/Outside India")
-
-# ECMO type & Diagnosis
-col_ecmo  = pick(df.columns, "ECMO Type", "ECMO_Type")
-col_diag  = pick(df.columns, "Provisional Diagnosis", "Provisional diagnos", "Provisional Diagnos")
-
-# Age, Senior intensivist
-col_age    = pick(df.columns, "Age of the patient", "Age")
-col_senior = pick(df.columns, "Name of Senior intensivist supervising the procedure")
-
-# handle duplicates coming from dedup (e.g., "Miscellaneous comments", "Miscellaneous comments (2)")
-col_misc1  = pick(df.columns, "Miscellaneous comments", "Miscellaneous comments (1)")
-col_misc2  = pick(df.columns, "Miscellaneous comments (2)")
-
-# Combine Misc columns into one (prefer non-empty)
-combined_misc_col = None
-if col_misc1 and col_misc2:
-    df["Miscellaneous comments"] = df.apply(lambda r: first_nonempty(r[col_misc1], r[col_misc2]), axis=1)
-    combined_misc_col = "Miscellaneous comments"
-elif col_misc1:
-    combined_misc_col = col_misc1
-elif col_misc2:
-    df.rename(columns={col_misc2: "Miscellaneous comments"}, inplace=True)
-    combined_misc_col = "Miscellaneous comments"
-
-# Single Google Maps link (use hospital + city + state)
-if col_hosp or col_city or col_state:
-    df["Google Maps"] = df.apply(
-        lambda r: build_maps_link(r.get(col_hosp, ""), r.get(col_city, ""), r.get(col_state, "")),
-        axis=1,
-    )
-
-# Add 1-based serial number
-df.insert(0, "S.No", range(1, len(df) + 1))
-
-# ---------------- Show ALL columns ----------------
-# Start with S.No, then every original column from the sheet, preserving their order.
-display_cols = ["S.No"] + orig_cols
-
-# If we created "Initiation DateTime" (no native Timestamp), slot it right after S.No.
-if "Initiation DateTime" in df.columns and "Initiation DateTime" not in display_cols:
-    display_cols.insert(1, "Initiation DateTime")
-
-# If we created a combined Misc column and it's not already present, append it.
-if combined_misc_col and combined_misc_col not in display_cols:
-    display_cols.append(combined_misc_col)
-
-# Ensure Google Maps is shown at the end.
-if "Google Maps" in df.columns and "Google Maps" not in display_cols:
-    display_cols.append("Google Maps")
+df, cols, display_cols, chart_counts, csv_bytes = prepare(df_raw)
+col_ecmo, col_state = cols["ecmo"], cols["state"]
 
-# Only include columns that exist (guard against rare mismatches)
-display_cols = [c for c in display_cols if c in df.columns]
-
-st.dataframe(
-    df[display_cols],
+# column_order picks/arranges the columns in the browser, so no reordered copy of df is made
+display_dataframe_quickly(
+    df,
+    column_order=display_cols,
     use_container_width=True,
     column_config={"Google Maps": st.column_config.LinkColumn("Google Maps")},
 )
 
-# Reload button
-left, _ = st.columns([1, 6])
+# Reload button + full export (the table above only sends a window of long sheets)
+left, mid, _ = st.columns([1, 1, 5])
 with left:
     if st.button("🔄 Reload data"):
         st.cache_data.clear()
+        _prune_snapshots(SHEET_ID, WORKSHEET_NAME)   # force a real refetch, even at the same revision
+with mid:
+    st.download_button(
+        "⬇️ Download CSV", csv_bytes, "ecmo_cases.csv", "text/csv"
+    )
 
 # ---------------- Charts ----------------
-st.markdown("---")
-st.subheader("📊 Quick Visuals")
-
-# Pie: ECMO Type
-if col_ecmo and df[col_ecmo].notna().any():
-    pie_df = (
-        df[[col_ecmo]]
-        .assign(**{col_ecmo: df[col_ecmo].fillna("Unknown").astype(str).str.strip()})
-        .groupby(col_ecmo, dropna=False).size().reset_index(name="count")
-        .sort_values("count", ascending=False)
+STATE_BAR_TOP_N = 20   # default number of state bars; smaller states are grouped as "Other"
+
+# Figures are cached on the aggregated counts, so reruns with unchanged data reuse them
+# (cache_data hands each session its own copy, so no figure object is shared).
+# Counts go in as int32 arrays, which Plotly ships to the browser as typed (base64) arrays.
+# Single traces are built with graph_objects directly (no plotly.express frame handling);
+# it is imported inside the builders, so it only loads once a chart is drawn.
+@st.cache_data(ttl=REFRESH_SECONDS)
+def build_pie_fig(labels: tuple, counts: tuple, name: str, title: str):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Pie(
+        labels=np.asarray(labels, dtype=object), values=np.asarray(counts, dtype="int32"),
+        hole=0.3, hovertemplate=f"{name}=%{{label}}<br>count=%{{value}}<extra></extra>",
+    ))
+    fig.update_layout(title=title)
+    return fig
+
+@st.cache_data(ttl=REFRESH_SECONDS)
+def build_bar_fig(labels: tuple, counts: tuple, name: str, title: str):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(
+        x=np.asarray(counts, dtype="int32"), y=np.asarray(labels, dtype=object), orientation="h",
+        hovertemplate=f"count=%{{x}}<br>{name}=%{{y}}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title, xaxis_title="count", yaxis_title=name,
+        yaxis={"categoryorder": "total ascending"},
     )
-    fig_pie = px.pie(pie_df, names=col_ecmo, values="count", title="ECMO Type distribution", hole=0.3)
-    st.plotly_chart(fig_pie, use_container_width=True)
-else:
-    st.info("No ECMO Type data to chart yet.")
-
-# Bar: State-wise counts
-if col_state and df[col_state].notna().any():
-    bar_df = (
-        df[[col_state]]
-        .assign(**{col_state: df[col_state].fillna("Unknown").astype(str).str.strip()})
-        .groupby(col_state, dropna=False).size().reset_index(name="count")
-        .sort_values("count", ascending=False)
-    )
-    fig_bar = px.bar(bar_df, x="count", y=col_state, orientation="h", title="State-wise ECMO cases")
-    fig_bar.update_layout(yaxis={"categoryorder": "total ascending"})
-    st.plotly_chart(fig_bar, use_container_width=True)
-else:
-    st.info("No Location State data to chart yet.")
-
+    return fig
+
+@st.fragment
+def quick_visuals(chart_counts: dict[str, pd.Series], col_ecmo: str | None, col_state: str | None):
+    """Charts section. A fragment: its own widgets rerun only this block, not the sheet load."""
+    st.markdown("---")
+    st.subheader("📊 Quick Visuals")
+
+    # Pie: ECMO Type
+    counts = chart_counts.get("ecmo")
+    if counts is not None and not counts.empty:
+        fig_pie = build_pie_fig(
+            tuple(counts.index.tolist()), tuple(counts.tolist()), col_ecmo, "ECMO Type distribution"
+        )
+        st.plotly_chart(fig_pie, use_container_width=True)
+    else:
+        st.info("No ECMO Type data to chart yet.")
+
+    # Bar: State-wise counts
+    counts = chart_counts.get("state")
+    if counts is not None and not counts.empty:
+        if len(counts) > STATE_BAR_TOP_N:
+            top_n = st.slider("States shown (rest grouped as 'Other')", 5, len(counts), STATE_BAR_TOP_N)
+            counts = top_n_with_other(counts, top_n)
+        fig_bar = build_bar_fig(
+            tuple(counts.index.tolist()), tuple(counts.tolist()), col_state, "State-wise ECMO cases"
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
+    else:
+        st.info("No Location State data to chart yet.")
+
+quick_visuals(chart_counts, col_ecmo, col_state)